@@ -1,24 +1,55 @@
-import json
+import functools
 import logging
 import os
+import threading
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 
 logger = logging.getLogger("config")
 
+_TRUE_LITERALS = frozenset(("1", "true", "yes", "on"))
+
+_REPO_DEFAULT_ICE_PATH = Path(__file__).resolve().parent.parent / "ice_config.json"
+
+_initial_ice_config_cache: Optional[Dict[str, Any]] = None
+
+# Parsed ICE config files keyed by path: (st_mtime_ns, st_size, data)
+_file_cfg_cache: Dict[Path, Tuple[int, int, Dict[str, Any]]] = {}
+_file_cfg_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_env(name: str) -> Optional[str]:
+    """Look up an environment variable once; unset variables are cached as ``None``."""
+    return os.environ.get(name)
+
+
+def cached_getenv(name: str, default: Optional[str] = None) -> Optional[str]:
+    """``os.getenv`` replacement backed by the per-process env cache."""
+    value = _cached_env(name)
+    return default if value is None else value
+
+
+def clear_env_cache():
+    """Forget cached environment lookups (for tests or after changing ``os.environ``)."""
+    _cached_env.cache_clear()
+
 
-def _parse_bool_env(value: str, default: bool = False) -> bool:
+def parse_bool_env(value: Optional[str], default: bool = False) -> bool:
+    """Interpret an env value as a boolean; ``None`` (unset) yields ``default``."""
     if value is None:
         return default
-    return value.lower() in ("1", "true", "yes", "on")
+    return value.lower() in _TRUE_LITERALS
 
 
 def _load_file_ice_config() -> Dict[str, Any]:
     """Attempt to load ICE configuration from JSON file."""
     search_paths = []
 
-    env_path = os.getenv("ICE_CONFIG_PATH")
+    env_path = _cached_env("ICE_CONFIG_PATH")
     if env_path:
         candidate = Path(env_path)
         if candidate.is_file():
@@ -26,19 +57,24 @@ def _load_file_ice_config() -> Dict[str, Any]:
         else:
             logger.warning("ICE_CONFIG_PATH %s is not a file, falling back to defaults", candidate)
 
-    repo_default = Path(__file__).resolve().parent.parent / "ice_config.json"
-    if repo_default.is_file():
-        search_paths.append(repo_default)
+    if _REPO_DEFAULT_ICE_PATH.is_file():
+        search_paths.append(_REPO_DEFAULT_ICE_PATH)
 
     for path in search_paths:
         try:
-            with path.open("r", encoding="utf-8") as fp:
-                data = json.load(fp)
+            st = path.stat()
+            with _file_cfg_lock:
+                cached = _file_cfg_cache.get(path)
+                if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    return dict(cached[2])
+
+                data = orjson.loads(path.read_bytes())
                 if isinstance(data, dict):
+                    _file_cfg_cache[path] = (st.st_mtime_ns, st.st_size, data)
                     logger.info("Loaded ICE config from %s", path)
-                    return data
+                    return dict(data)
                 logger.warning("ICE config file %s does not contain a JSON object", path)
-        except json.JSONDecodeError as exc:
+        except ValueError as exc:  # orjson.JSONDecodeError
             logger.error("Failed to parse ICE config %s: %s", path, exc)
         except OSError as exc:
             logger.error("Failed to read ICE config %s: %s", path, exc)
@@ -46,7 +82,7 @@ def _load_file_ice_config() -> Dict[str, Any]:
     return {}
 
 
-def get_initial_ice_config() -> Dict[str, Any]:
+def _build_initial_ice_config() -> Dict[str, Any]:
     """Build initial ICE/TURN config.
 
     Priority order:
@@ -68,24 +104,51 @@ def get_initial_ice_config() -> Dict[str, Any]:
     if file_config:
         config.update({k: v for k, v in file_config.items() if v is not None})
 
-    urls_raw = os.getenv("TURN_URLS")
+    return _env_ice_config(config)
+
+
+def _env_ice_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply ``USE_TURN``, ``TURN_URLS`` etc. overrides on top of ``config``."""
+    urls_raw = _cached_env("TURN_URLS")
     if urls_raw:
         urls: List[str] = [u.strip() for u in urls_raw.split(",") if u.strip()]
         if urls:
             config["urls"] = urls
 
-    if "USE_TURN" in os.environ:
-        config["use_turn"] = _parse_bool_env(os.getenv("USE_TURN"), default=config["use_turn"])
+    use_turn = _cached_env("USE_TURN")
+    if use_turn is not None:
+        config["use_turn"] = parse_bool_env(use_turn, default=config["use_turn"])
+
+    username = _cached_env("TURN_USERNAME")
+    if username is not None:
+        config["username"] = username or None
 
-    if "TURN_USERNAME" in os.environ:
-        config["username"] = os.getenv("TURN_USERNAME") or None
+    credential = _cached_env("TURN_CREDENTIAL")
+    if credential is not None:
+        config["credential"] = credential or None
 
-    if "TURN_CREDENTIAL" in os.environ:
-        config["credential"] = os.getenv("TURN_CREDENTIAL") or None
+    relay_only = _cached_env("ICE_RELAY_ONLY")
+    if relay_only is not None:
+        config["relay_only"] = parse_bool_env(relay_only, default=config["relay_only"])
+
+    return config
 
-    if "ICE_RELAY_ONLY" in os.environ:
-        config["relay_only"] = _parse_bool_env(os.getenv("ICE_RELAY_ONLY"), default=config["relay_only"])
 
+def get_initial_ice_config() -> Dict[str, Any]:
+    """Return the initial ICE/TURN config, building it on first use.
+
+    Callers receive their own copy, so mutating it does not affect the cache.
+    """
+    global _initial_ice_config_cache
+    if _initial_ice_config_cache is None:
+        _initial_ice_config_cache = _build_initial_ice_config()
+    config = dict(_initial_ice_config_cache)
+    config["urls"] = list(config.get("urls") or [])
     return config
 
 
+def reset_initial_ice_config_cache():
+    """Drop the cached ICE config so the next call re-reads file and environment."""
+    global _initial_ice_config_cache
+    _initial_ice_config_cache = None
+    clear_env_cache()
@@ -1,36 +1,115 @@
 import asyncio
-import os
-from typing import Optional, Dict, Any
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping, Tuple
 from datetime import datetime, timezone
 import logging
 
+from aiortc import RTCIceServer
+
 from drivers.camera import CameraService, RealSenseBackend
-from app.config import get_initial_ice_config
+from app.config import get_initial_ice_config, cached_getenv, clear_env_cache, parse_bool_env
 
 logger = logging.getLogger("state")
 
 camera_service: Optional[CameraService] = None
-ice_config: Dict[str, Any] = {}
+# Serializes lazy init/restart: start() runs in a worker thread, so without it
+# two concurrent requests could both see running=False and start the service twice
+camera_start_lock = asyncio.Lock()
+# Copy-on-write snapshot: writers rebind it under ice_lock, readers take no lock
+_ice_config_snapshot: Mapping[str, Any] = MappingProxyType({})
 ice_lock = asyncio.Lock()
 
-def get_camera_config():
-    """Get camera configuration from environment variables."""
-    return {
-        "width": int(os.getenv("CAMERA_WIDTH", "640")),
-        "height": int(os.getenv("CAMERA_HEIGHT", "480")),
-        "fps": int(os.getenv("CAMERA_FPS", "30")),
-        "rotation": int(os.getenv("CAMERA_ROTATION", "180")),
-        "serial": os.getenv("CAMERA_SERIAL", None)
-    }
+# RTCIceServer list built from the snapshot, rebuilt when the config version changes
+_ice_config_version = 0
+_ice_servers_cache: Optional[Tuple[int, List[RTCIceServer]]] = None
+
+_camera_config_cache: Optional[Mapping[str, Any]] = None
+
+def get_camera_config() -> Mapping[str, Any]:
+    """Get camera configuration from environment variables.
+
+    The environment is parsed once; subsequent calls return the same read-only
+    mapping. Use ``reset_camera_config_cache()`` to force a re-read.
+    """
+    global _camera_config_cache
+    if _camera_config_cache is None:
+        _camera_config_cache = _build_camera_config()
+    return _camera_config_cache
+
+def _build_camera_config() -> Mapping[str, Any]:
+    return MappingProxyType({
+        "width": int(cached_getenv("CAMERA_WIDTH", "640")),
+        "height": int(cached_getenv("CAMERA_HEIGHT", "480")),
+        "fps": int(cached_getenv("CAMERA_FPS", "30")),
+        "rotation": int(cached_getenv("CAMERA_ROTATION", "180")),
+        "serial": cached_getenv("CAMERA_SERIAL", None),
+        "use_opencl": parse_bool_env(cached_getenv("CAMERA_USE_OPENCL"))
+    })
+
+def reset_camera_config_cache():
+    """Drops the cached camera config so the next call re-reads the environment."""
+    global _camera_config_cache
+    _camera_config_cache = None
+    clear_env_cache()
+
+@dataclass(slots=True)
+class Connection:
+    """State of the active WebRTC connection."""
+    pc: Any
+    track: Any
+    created_at: datetime  # wall-clock, for display only
+    created_at_monotonic: float = field(default_factory=time.monotonic)
+    connection_state: str = "new"
+    ice_connection_state: str = "new"
+    ice_gathering_state: str = "new"
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+_STATE_ATTRS = {
+    "connection": "connection_state",
+    "ice_connection": "ice_connection_state",
+    "ice_gathering": "ice_gathering_state",
+}
 
 # Single connection management: only one active WebRTC connection at a time
 current_client_id: Optional[str] = None
-current_connection: Optional[Dict[str, Any]] = None
+current_connection: Optional[Connection] = None
 connections_lock = asyncio.Lock()
+# Immutable client id list, rebuilt only when the active client changes
+_clients_snapshot: Tuple[str, ...] = ()
+
+# Reused by every create_connection() instead of allocating a new Connection
+_connection_slot: Connection = Connection.__new__(Connection)
+_connection_slot.extra = {}
+
+def _clear_current_connection():
+    """Drops the active client and releases pc/track references held by the slot."""
+    global current_client_id, current_connection, _clients_snapshot
+    current_client_id = None
+    current_connection = None
+    _clients_snapshot = ()
+    _connection_slot.pc = None
+    _connection_slot.track = None
+    _connection_slot.extra.clear()
+
+def _prime_caches():
+    """Parses camera and ICE config once at startup so later getters are plain lookups.
+
+    Already-populated caches are kept: the ICE snapshot may have been updated at runtime.
+    """
+    global _camera_config_cache, _ice_config_snapshot, _ice_config_version
+    if _camera_config_cache is None:
+        _camera_config_cache = _build_camera_config()
+    if not _ice_config_snapshot:
+        _ice_config_snapshot = MappingProxyType(get_initial_ice_config())
+        _ice_config_version += 1
+        logger.info("ICE config initialized successfully")
 
 async def init_state():
-    global camera_service, ice_config
+    global camera_service
     try:
+        _prime_caches()
         if camera_service is None:
             # Initialize camera backend with retry mechanism
             max_init_retries = 3
@@ -38,26 +117,28 @@ async def init_state():
             
             # Get camera configuration
             camera_config = get_camera_config()
-            logger.info(f"Camera config: {camera_config}")
+            logger.info("Camera config: %s", dict(camera_config))
             
+            backend = None
             for attempt in range(max_init_retries):
                 try:
-                    logger.info(f"Initializing camera service (attempt {attempt + 1}/{max_init_retries})")
+                    logger.info("Initializing camera service (attempt %s/%s)", attempt + 1, max_init_retries)
                     backend = RealSenseBackend(
                         serial=camera_config["serial"],
                         width=camera_config["width"],
                         height=camera_config["height"],
                         fps=camera_config["fps"],
-                        rotation=camera_config["rotation"]
+                        rotation=camera_config["rotation"],
+                        use_opencl=camera_config["use_opencl"]
                     )
                     camera_service = CameraService(backend)
-                    camera_service.start()
+                    await asyncio.to_thread(camera_service.start)
                     logger.info("Camera service initialized successfully")
                     break
                 except Exception as e:
-                    logger.warning(f"Camera initialization attempt {attempt + 1} failed: {e}")
+                    logger.warning("Camera initialization attempt %s failed: %s", attempt + 1, e)
                     if attempt < max_init_retries - 1:
-                        logger.info(f"Retrying camera initialization in {init_retry_delay} seconds...")
+                        logger.info("Retrying camera initialization in %s seconds...", init_retry_delay)
                         await asyncio.sleep(init_retry_delay)
                         # Clean up failed service
                         if camera_service:
@@ -69,24 +150,24 @@ async def init_state():
                     else:
                         # Final attempt failed - create a stub service that will try to reconnect
                         logger.warning("Failed to initialize camera service, creating stub for later reconnection")
-                        backend = RealSenseBackend(
-                            serial=camera_config["serial"],
-                            width=camera_config["width"],
-                            height=camera_config["height"],
-                            fps=camera_config["fps"],
-                            rotation=camera_config["rotation"]
-                        )
+                        # Reuse the backend from the last attempt instead of probing the device again
+                        if backend is None:
+                            backend = RealSenseBackend(
+                                serial=camera_config["serial"],
+                                width=camera_config["width"],
+                                height=camera_config["height"],
+                                fps=camera_config["fps"],
+                                rotation=camera_config["rotation"],
+                                use_opencl=camera_config["use_opencl"]
+                            )
                         camera_service = CameraService(backend)
                         # Don't start the service yet, it will be started when camera becomes available
                         camera_service.running = False
                         camera_service.backend.connection_state = "disconnected"
                         logger.info("Camera stub service created - will attempt reconnection when camera becomes available")
 
-        if not ice_config:
-            ice_config = get_initial_ice_config()
-            logger.info("ICE config initialized successfully")
     except Exception as e:
-        logger.error(f"Failed to initialize state: {e}")
+        logger.error("Failed to initialize state: %s", e)
         # Don't re-raise the exception to allow the service to start without camera
         # The camera endpoints will handle the case where camera_service is None
         logger.warning("Service will start without camera functionality")
@@ -98,173 +179,208 @@ async def shutdown_state():
             camera_service.stop()
             logger.info("Camera service stopped successfully")
         except Exception as e:
-            logger.error(f"Error stopping camera service: {e}")
+            logger.error("Error stopping camera service: %s", e)
         finally:
             camera_service = None
 
-async def get_ice_config_state() -> Dict[str, Any]:
-    async with ice_lock:
-        return dict(ice_config)
+async def get_ice_config_state() -> Mapping[str, Any]:
+    """Returns the current ICE config as a read-only snapshot (no copy)."""
+    return _ice_config_snapshot
 
-async def update_ice_config_state(new_config: Dict[str, Any]) -> Dict[str, Any]:
+async def update_ice_config_state(new_config: Dict[str, Any]) -> Mapping[str, Any]:
+    global _ice_config_snapshot, _ice_config_version
     async with ice_lock:
         try:
+            updated = dict(_ice_config_snapshot)
             if "use_turn" in new_config:
-                ice_config["use_turn"] = bool(new_config["use_turn"])
+                updated["use_turn"] = bool(new_config["use_turn"])
             if "urls" in new_config and isinstance(new_config["urls"], list):
                 # Валидация URL-ов
-                valid_urls = []
-                for url in new_config["urls"]:
-                    if isinstance(url, str) and url.strip():
-                        valid_urls.append(url.strip())
-                ice_config["urls"] = valid_urls
+                updated["urls"] = [u.strip() for u in new_config["urls"] if isinstance(u, str) and u.strip()]
             if "username" in new_config and new_config["username"] is not None:
-                ice_config["username"] = str(new_config["username"])
+                updated["username"] = str(new_config["username"])
             if "credential" in new_config and new_config["credential"] is not None:
-                ice_config["credential"] = str(new_config["credential"])
+                updated["credential"] = str(new_config["credential"])
             if "relay_only" in new_config:
-                ice_config["relay_only"] = bool(new_config["relay_only"])
-            return dict(ice_config)
+                updated["relay_only"] = bool(new_config["relay_only"])
+            _ice_config_snapshot = MappingProxyType(updated)
+            _ice_config_version += 1
+            return _ice_config_snapshot
         except Exception as e:
-            logger.error(f"Error updating ICE config: {e}")
+            logger.error("Error updating ICE config: %s", e)
             raise
 
-async def create_connection(client_id: str, pc, track, extra_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+async def get_cached_ice_servers() -> List[RTCIceServer]:
+    """Returns the ICE servers for new peer connections, built once per config version.
+
+    The list is shared between sessions and must not be mutated.
+    """
+    global _ice_servers_cache
+    cached = _ice_servers_cache
+    if cached is not None and cached[0] == _ice_config_version:
+        return cached[1]
+
+    version, current_ice = _ice_config_version, _ice_config_snapshot
+    ice_servers = []
+    urls = current_ice.get("urls") or []
+    if urls:
+        ice_servers.append(RTCIceServer(
+            urls=list(urls),
+            username=current_ice.get("username"),
+            credential=current_ice.get("credential")
+        ))
+    _ice_servers_cache = (version, ice_servers)
+    return ice_servers
+
+async def create_connection(client_id: str, pc, track, extra_data: Optional[Dict[str, Any]] = None) -> Connection:
     """Creates a new WebRTC connection, disconnecting the previous client if exists."""
     async with connections_lock:
-        global current_client_id, current_connection
+        global current_client_id, current_connection, _clients_snapshot
         
         # Disconnect existing client if any
         if current_client_id is not None and current_connection is not None:
-            logger.info(f"Disconnecting previous client {current_client_id}")
+            logger.info("Disconnecting previous client %s", current_client_id)
             try:
-                await current_connection["pc"].close()
-                logger.info(f"Previous client {current_client_id} disconnected successfully")
+                await current_connection.pc.close()
+                logger.info("Previous client %s disconnected successfully", current_client_id)
             except Exception as e:
-                logger.warning(f"Error disconnecting previous client {current_client_id}: {e}")
+                logger.warning("Error disconnecting previous client %s: %s", current_client_id, e)
         
-        # Create new connection data
-        connection_data = {
-            "pc": pc,
-            "track": track,
-            "created_at": datetime.now(timezone.utc),
-            "connection_state": "new",
-            "ice_connection_state": "new",
-            "ice_gathering_state": "new",
-        }
+        # Fill the preallocated connection slot in place
+        slot = _connection_slot
+        slot.pc = pc
+        slot.track = track
+        slot.created_at = datetime.now(timezone.utc)
+        slot.created_at_monotonic = time.monotonic()
+        slot.connection_state = "new"
+        slot.ice_connection_state = "new"
+        slot.ice_gathering_state = "new"
+        slot.extra.clear()
         if extra_data:
-            connection_data.update(extra_data)
+            slot.extra.update(extra_data)
 
         # Set new client as current
         current_client_id = client_id
-        current_connection = connection_data
+        current_connection = slot
+        _clients_snapshot = (client_id,)
         
-        logger.info(f"New client {client_id} connected successfully")
+        logger.info("New client %s connected successfully", client_id)
         return current_connection
 
-async def get_connection(client_id: str) -> Optional[Dict[str, Any]]:
+async def get_connection(client_id: str) -> Optional[Connection]:
     """Gets connection data only if the client is currently active."""
-    async with connections_lock:
-        if current_client_id == client_id and current_connection is not None:
-            return current_connection
-        return None
+    # Read-only: snapshot both globals instead of taking connections_lock
+    cid, conn = current_client_id, current_connection
+    if cid == client_id and conn is not None:
+        return conn
+    return None
+
+def record_connection_state(client_id: str, state_type: str, state_value: str):
+    """Records a state transition for the active client without awaiting.
+
+    A single attribute store on the event-loop thread cannot interleave with
+    other coroutines, so connections_lock is not needed here.
+    """
+    attr = _STATE_ATTRS.get(state_type)
+    if attr is None:
+        return
+    conn = current_connection
+    if current_client_id == client_id and conn is not None:
+        setattr(conn, attr, state_value)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updated %s state for client %s: %s", state_type, client_id, state_value)
 
 async def update_connection_state(client_id: str, state_type: str, state_value: str):
     """Updates connection state only for the currently active client."""
-    async with connections_lock:
-        if current_client_id == client_id and current_connection is not None:
-            current_connection[f"{state_type}_state"] = state_value
-            logger.debug(f"Updated {state_type} state for client {client_id}: {state_value}")
+    record_connection_state(client_id, state_type, state_value)
 
 async def remove_connection(client_id: str):
     """Removes connection for the specified client (only if it's currently active)."""
     async with connections_lock:
-        global current_client_id, current_connection
-        
         if current_client_id == client_id and current_connection is not None:
             try:
-                await current_connection["pc"].close()
-                logger.info(f"Client {client_id} disconnected successfully")
+                await current_connection.pc.close()
+                logger.info("Client %s disconnected successfully", client_id)
             except Exception as e:
-                logger.warning(f"Error disconnecting client {client_id}: {e}")
+                logger.warning("Error disconnecting client %s: %s", client_id, e)
             finally:
-                current_client_id = None
-                current_connection = None
+                _clear_current_connection()
         else:
-            logger.info(f"Client {client_id} is not currently connected or doesn't exist")
+            logger.info("Client %s is not currently connected or doesn't exist", client_id)
 
-async def get_all_connections() -> Dict[str, Dict[str, Any]]:
+async def get_all_connections() -> Dict[str, Connection]:
     """Returns information about the currently active client (if any)."""
-    async with connections_lock:
-        if current_client_id is not None and current_connection is not None:
-            return {current_client_id: current_connection}
-        return {}
+    cid, conn = current_client_id, current_connection
+    if cid is not None and conn is not None:
+        return {cid: conn}
+    return {}
+
+async def get_client_ids_snapshot() -> Tuple[str, ...]:
+    """Returns ids of connected clients as a shared immutable tuple (no copy)."""
+    return _clients_snapshot
 
 async def cleanup_old_connections():
     """Disconnects client if connection is older than 1 hour."""
     async with connections_lock:
-        global current_client_id, current_connection
-        
         if current_client_id is not None and current_connection is not None:
-            now = datetime.now(timezone.utc)
-            connection_age = (now - current_connection["created_at"]).total_seconds()
+            connection_age = time.monotonic() - current_connection.created_at_monotonic
             
             if connection_age > 3600:  # 1 hour
-                logger.info(f"Client {current_client_id} connected for {connection_age:.0f} seconds - disconnecting due to timeout")
+                logger.info("Client %s connected for %.0f seconds - disconnecting due to timeout", current_client_id, connection_age)
                 try:
-                    await current_connection["pc"].close()
-                    logger.info(f"Old client {current_client_id} disconnected due to timeout")
+                    await current_connection.pc.close()
+                    logger.info("Old client %s disconnected due to timeout", current_client_id)
                 except Exception as e:
-                    logger.warning(f"Error disconnecting old client {current_client_id}: {e}")
+                    logger.warning("Error disconnecting old client %s: %s", current_client_id, e)
                 finally:
-                    current_client_id = None
-                    current_connection = None
-            else:
-                logger.debug(f"Client {current_client_id} connected for {connection_age:.0f} seconds - still within timeout")
+                    _clear_current_connection()
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Client %s connected for %.0f seconds - still within timeout", current_client_id, connection_age)
         else:
             logger.debug("No active connections to cleanup")
 
 async def force_release_camera():
     """Forcefully disconnects the current client."""
     async with connections_lock:
-        global current_client_id, current_connection
-        
         if current_client_id is not None and current_connection is not None:
-            logger.info(f"Force disconnecting client {current_client_id}")
+            logger.info("Force disconnecting client %s", current_client_id)
             try:
-                await current_connection["pc"].close()
-                logger.info(f"Client {current_client_id} force disconnected successfully")
+                await current_connection.pc.close()
+                logger.info("Client %s force disconnected successfully", current_client_id)
             except Exception as e:
-                logger.warning(f"Error force disconnecting client {current_client_id}: {e}")
+                logger.warning("Error force disconnecting client %s: %s", current_client_id, e)
             finally:
-                current_client_id = None
-                current_connection = None
+                _clear_current_connection()
         else:
             logger.info("No active connections to force disconnect")
 
 async def get_current_client_info() -> Optional[Dict[str, Any]]:
     """Returns information about the currently connected client."""
-    async with connections_lock:
-        if current_client_id is not None and current_connection is not None:
-            return {
-                "client_id": current_client_id,
-                "connection": current_connection,
-                "time_in_cell": (datetime.now(timezone.utc) - current_connection["created_at"]).total_seconds()
-            }
-        return None
+    cid, conn = current_client_id, current_connection
+    if cid is not None and conn is not None:
+        return {
+            "client_id": cid,
+            "connection": conn,
+            "time_in_cell": time.monotonic() - conn.created_at_monotonic
+        }
+    return None
 
 async def get_camera_service():
     """Returns the initialized camera service."""
     global camera_service
-    if camera_service is None:
-        logger.warning("Camera service not initialized, initializing now")
-        await init_state()
-    elif not camera_service.running and hasattr(camera_service.backend, 'connection_state'):
-        # Camera service exists but is not running - try to reconnect
-        logger.info("Camera service exists but not running, attempting reconnection")
-        try:
-            camera_service.start()
-            logger.info("Camera service reconnected successfully")
-        except Exception as e:
-            logger.warning(f"Failed to reconnect camera service: {e}")
+    if camera_service is not None and camera_service.running:
+        return camera_service
+    async with camera_start_lock:
+        # Re-check: another request may have started the service while we waited
+        if camera_service is None:
+            logger.warning("Camera service not initialized, initializing now")
+            await init_state()
+        elif not camera_service.running:
+            # Camera service exists but is not running - try to reconnect
+            logger.info("Camera service exists but not running, attempting reconnection")
+            try:
+                await asyncio.to_thread(camera_service.start)
+                logger.info("Camera service reconnected successfully")
+            except Exception as e:
+                logger.warning("Failed to reconnect camera service: %s", e)
     return camera_service
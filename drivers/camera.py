@@ -7,20 +7,90 @@ import time
 import logging
 import psutil
 import os
+import re
 import signal
+from dataclasses import asdict, dataclass
 from typing import Optional, Tuple
 
 logger = logging.getLogger("camera")
 logging.basicConfig(level=logging.INFO)
 
+# Command-line keywords of processes that might hold the RealSense device
+_CONFLICT_RE = re.compile(
+    r'realsense|rs-(?:sensor-control|enumerate|data-collect|convert)|python|camera',
+    re.IGNORECASE,
+)
+CONFLICTS_CACHE_TTL = 5.0  # seconds
+
+NS_PER_SEC = 1_000_000_000
+
+# Substrings librealsense uses for frame timeouts (RuntimeError, no dedicated type)
+_TIMEOUT_MARKERS = ("timeout", "didn't arrive")
+
+
+def _is_timeout_message(message: str) -> bool:
+    """Check an already-lowercased error message for frame-timeout markers."""
+    return any(marker in message for marker in _TIMEOUT_MARKERS)
+
+
+_CV_ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+_RS_CTX: Optional[rs.context] = None
+
+
+def _get_rs_context() -> rs.context:
+    """Return the process-wide librealsense context, creating it on first use.
+
+    ``query_devices()`` rescans the bus on each call, so one context serves every
+    availability check and hardware reset.
+    """
+    global _RS_CTX
+    if _RS_CTX is None:
+        _RS_CTX = rs.context()
+    return _RS_CTX
+
 
 class CameraError(Exception):
     """Custom camera exception for unified error handling."""
 
 
+@dataclass(slots=True)
+class ConnectionState:
+    """Connection bookkeeping of a backend; field names match the status response."""
+    state: str = "disconnected"  # disconnected, connecting, connected, failed
+    retry_count: int = 0
+    last_attempt: float = 0.0
+    last_successful_frame: float = 0.0
+    running: bool = False
+
+
 class CameraBackend:
     """Абстрактный backend для получения кадров."""
 
+    def __init__(self):
+        self.status = ConnectionState()
+
+    @property
+    def connection_state(self) -> str:
+        return self.status.state
+
+    @connection_state.setter
+    def connection_state(self, value: str):
+        self.status.state = value
+
+    @property
+    def running(self) -> bool:
+        return self.status.running
+
+    @running.setter
+    def running(self, value: bool):
+        self.status.running = value
+
     def start(self):
         raise NotImplementedError
 
@@ -35,36 +105,51 @@ class CameraBackend:
 class RealSenseBackend(CameraBackend):
     def __init__(self, serial: Optional[str] = None,
                  width: int = 640, height: int = 480, fps: int = 30,
-                 rotation: int = 0):
+                 rotation: int = 0, depth_enabled: bool = False,
+                 diagnose_conflicts: bool = False, use_opencl: bool = False):
+        super().__init__()
         self.serial = serial
         self.width = width
         self.height = height
         self.fps = fps
         self.rotation = rotation  # Rotation angle: 0, 90, 180, 270
+        self.depth_enabled = depth_enabled  # Align depth to color; color-only streams skip it
+        self.diagnose_conflicts = diagnose_conflicts  # Full cmdline scan for conflicting processes
 
         self.pipeline: Optional[rs.pipeline] = None
         self.align: Optional[rs.align] = None
-        self.temp_filter = rs.temporal_filter()
-        self.colorizer = rs.colorizer()
-        self.running = False
         self.max_retries = 3
         self.retry_delay = 2.0
         
-        # Connection state management
-        self.connection_state = "disconnected"  # disconnected, connecting, connected, failed
-        self.last_connection_attempt = 0.0
-        self.connection_retry_count = 0
+        # Connection state management (state itself lives in self.status)
         self.max_connection_retries = 5
         self.connection_retry_delay = 5.0  # Base delay in seconds
         self.max_connection_retry_delay = 300.0  # Max delay: 5 minutes
-        self.last_successful_frame = 0.0
         self.connection_timeout = 30.0  # Consider disconnected if no frames for 30 seconds
+        self._queue: Optional[rs.frame_queue] = None
+        self._conflicts_cache: Optional[Tuple[float, bool, list]] = None
+
+        # Optional OpenCL (T-API) rotation; only pays off for large frames.
+        # Process-wide cv2.ocl.setUseOpenCL() is left alone: if OpenCL is
+        # disabled for the process, the NumPy path is used instead.
+        self._cv_rot_code = _CV_ROTATE_CODES.get(rotation)
+        self._use_opencl = use_opencl and cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+        if self._use_opencl:
+            logger.info("OpenCL available, rotating frames on the GPU")
+        elif use_opencl:
+            logger.warning("OpenCL rotation requested but OpenCL is unavailable or disabled")
+
+        # Preallocated destinations for 90°/270° rotation. Two buffers alternate so a
+        # consumer still reading the previously published frame isn't overwritten.
+        self._rot_bufs = []
+        self._rot_idx = 0
+        if rotation in (90, 270):
+            self._rot_bufs = [np.empty((width, height, 3), dtype=np.uint8) for _ in range(2)]
 
     def _check_device_availability(self) -> bool:
         """Check if the RealSense device is available and not in use."""
         try:
-            ctx = rs.context()
-            devices = ctx.query_devices()
+            devices = _get_rs_context().query_devices()
             
             if not devices:
                 logger.warning("No RealSense devices found")
@@ -96,36 +181,61 @@ class RealSenseBackend(CameraBackend):
             logger.error(f"Error checking device availability: {e}")
             return False
 
-    def _find_conflicting_processes(self) -> list:
-        """Find processes that might be using the RealSense camera."""
+    def _find_conflicting_processes(self, quick: bool = True) -> list:
+        """Find processes that might be using the RealSense camera.
+
+        In quick mode only process names are matched (read from /proc/<pid>/stat
+        alone) and the scan is skipped entirely on non-POSIX hosts; command lines
+        are read only for processes whose name matched. Full mode matches against
+        every command line. The result is cached for a few seconds so retry storms
+        don't rescan /proc.
+        """
+        now = time.monotonic()
+        cached = self._conflicts_cache
+        if cached is not None and cached[1] == quick and now - cached[0] < CONFLICTS_CACHE_TTL:
+            return cached[2]
+
         conflicting_processes = []
+        if quick and os.name != 'posix':
+            return conflicting_processes
+        own_pid = os.getpid()
+        attrs = ['pid', 'name'] if quick else ['pid', 'name', 'cmdline']
         
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            # attrs= makes psutil read all fields in one oneshot() pass per process
+            for proc in psutil.process_iter(attrs=attrs, ad_value=None):
                 try:
                     proc_info = proc.info
-                    cmdline = ' '.join(proc_info['cmdline'] or [])
-                    
-                    # Look for processes that might be using RealSense
-                    realsense_keywords = [
-                        'realsense', 'rs', 'rs-sensor-control', 'rs-enumerate-devices',
-                        'rs-data-collect', 'rs-convert', 'python', 'camera'
-                    ]
-                    
-                    if any(keyword in cmdline.lower() for keyword in realsense_keywords):
-                        # Skip our own process
-                        if proc_info['pid'] != os.getpid():
-                            conflicting_processes.append({
-                                'pid': proc_info['pid'],
-                                'name': proc_info['name'],
-                                'cmdline': cmdline
-                            })
+                    # Skip our own process
+                    if proc_info['pid'] == own_pid:
+                        continue
+
+                    # Look for processes that might be using RealSense. The name is
+                    # checked first; keywords contain no spaces, so args are searched
+                    # one by one and the cmdline is only joined for reporting a hit.
+                    name_hit = _CONFLICT_RE.search(proc_info['name'] or '') is not None
+                    if quick:
+                        if not name_hit:
+                            continue
+                        cmdline = ' '.join(proc.cmdline())
+                    else:
+                        args = proc_info['cmdline'] or []
+                        if not name_hit and not any(_CONFLICT_RE.search(arg) for arg in args):
+                            continue
+                        cmdline = ' '.join(args)
+
+                    conflicting_processes.append({
+                        'pid': proc_info['pid'],
+                        'name': proc_info['name'],
+                        'cmdline': cmdline
+                    })
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     continue
                     
         except Exception as e:
             logger.warning(f"Error scanning for conflicting processes: {e}")
             
+        self._conflicts_cache = (now, quick, conflicting_processes)
         return conflicting_processes
 
     def _force_release_device(self):
@@ -148,8 +258,7 @@ class RealSenseBackend(CameraBackend):
             if os.name == 'posix':
                 try:
                     # This is a more aggressive approach - reset USB device
-                    ctx = rs.context()
-                    devices = ctx.query_devices()
+                    devices = _get_rs_context().query_devices()
                     for device in devices:
                         if not self.serial or device.get_info(rs.camera_info.serial_number) == self.serial:
                             device.hardware_reset()
@@ -163,45 +272,61 @@ class RealSenseBackend(CameraBackend):
             logger.warning(f"Error during force release: {e}")
 
     def _rotate_image(self, image: np.ndarray) -> np.ndarray:
-        """Rotate image by the specified angle."""
+        """Rotate image by the specified angle.
+
+        Right-angle rotations are index permutations, so they are done with NumPy
+        views. 180° stays a (negative-stride) view; 90°/270° are made contiguous
+        because the transposed layout is unfriendly to downstream consumers.
+        """
         if self.rotation == 0:
             return image
+        elif self._use_opencl and self._cv_rot_code is not None:
+            return cv2.rotate(cv2.UMat(image), self._cv_rot_code).get()
         elif self.rotation == 90:
-            return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+            return self._rotate_into_buffer(np.rot90(image, k=-1))
         elif self.rotation == 180:
-            return cv2.rotate(image, cv2.ROTATE_180)
+            return image[::-1, ::-1]
         elif self.rotation == 270:
-            return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            return self._rotate_into_buffer(np.rot90(image, k=1))
         else:
             logger.warning(f"Invalid rotation angle {self.rotation}, using 0")
             return image
 
+    def _rotate_into_buffer(self, rotated: np.ndarray) -> np.ndarray:
+        """Copy a rotated view into the next preallocated buffer."""
+        if not self._rot_bufs or self._rot_bufs[0].shape != rotated.shape:
+            return np.ascontiguousarray(rotated)
+        buf = self._rot_bufs[self._rot_idx]
+        self._rot_idx ^= 1
+        np.copyto(buf, rotated)
+        return buf
+
     def _should_attempt_reconnection(self) -> bool:
         """Check if we should attempt to reconnect to the camera."""
         current_time = time.time()
         
         # If we're already connecting, don't start another attempt
-        if self.connection_state == "connecting":
+        if self.status.state == "connecting":
             return False
             
         # If we're connected and recently got frames, no need to reconnect
-        if (self.connection_state == "connected" and 
-            current_time - self.last_successful_frame < self.connection_timeout):
+        if (self.status.state == "connected" and 
+            current_time - self.status.last_successful_frame < self.connection_timeout):
             return False
             
         # If we've exceeded max retries, use exponential backoff
-        if self.connection_retry_count >= self.max_connection_retries:
-            time_since_last_attempt = current_time - self.last_connection_attempt
+        if self.status.retry_count >= self.max_connection_retries:
+            time_since_last_attempt = current_time - self.status.last_attempt
             backoff_delay = min(
-                self.connection_retry_delay * (2 ** (self.connection_retry_count - self.max_connection_retries)),
+                self.connection_retry_delay * (2 ** (self.status.retry_count - self.max_connection_retries)),
                 self.max_connection_retry_delay
             )
             if time_since_last_attempt < backoff_delay:
                 return False
                 
         # If we're in failed state and haven't waited long enough
-        if (self.connection_state == "failed" and 
-            current_time - self.last_connection_attempt < self.connection_retry_delay):
+        if (self.status.state == "failed" and 
+            current_time - self.status.last_attempt < self.connection_retry_delay):
             return False
             
         return True
@@ -213,10 +338,10 @@ class RealSenseBackend(CameraBackend):
         if not self._should_attempt_reconnection():
             return False
             
-        logger.info(f"Attempting camera reconnection (attempt {self.connection_retry_count + 1})")
-        self.connection_state = "connecting"
-        self.last_connection_attempt = current_time
-        self.connection_retry_count += 1
+        logger.info(f"Attempting camera reconnection (attempt {self.status.retry_count + 1})")
+        self.status.state = "connecting"
+        self.status.last_attempt = current_time
+        self.status.retry_count += 1
         
         try:
             # Clean up any existing pipeline
@@ -233,50 +358,60 @@ class RealSenseBackend(CameraBackend):
             # Check if device is available
             if not self._check_device_availability():
                 logger.warning("Camera device not available for reconnection")
-                self.connection_state = "failed"
+                self.status.state = "failed"
                 return False
             
             # Try to start the pipeline
-            self.pipeline = rs.pipeline()
-            config = rs.config()
-            
-            if self.serial:
-                config.enable_device(self.serial)
-
-            config.enable_stream(rs.stream.color, self.width, self.height,
-                                 rs.format.bgr8, self.fps)
-
-            self.pipeline.start(config)
-            self.align = rs.align(rs.stream.color)
-            self.running = True
-            self.connection_state = "connected"
-            self.connection_retry_count = 0  # Reset retry count on successful connection
-            self.last_successful_frame = current_time
+            self._start_pipeline()
+            self.status.running = True
+            self.status.state = "connected"
+            self.status.retry_count = 0  # Reset retry count on successful connection
+            self.status.last_successful_frame = current_time
             
             logger.info("Camera reconnection successful")
             return True
             
         except Exception as e:
             logger.warning(f"Camera reconnection failed: {e}")
-            self.connection_state = "failed"
+            self.status.state = "failed"
             return False
 
+    def _start_pipeline(self):
+        """Create and start the pipeline, delivering frames into a size-1 queue.
+
+        librealsense pushes frames into the queue from its own thread; with capacity 1
+        an older frame is dropped as soon as a newer one arrives, so get_frame()
+        always sees the latest frame.
+        """
+        self.pipeline = rs.pipeline()
+        config = rs.config()
+
+        if self.serial:
+            config.enable_device(self.serial)
+
+        config.enable_stream(rs.stream.color, self.width, self.height,
+                             rs.format.bgr8, self.fps)
+
+        self._queue = rs.frame_queue(1, keep_frames=False)
+        self.pipeline.start(config, self._queue)
+        self.align = rs.align(rs.stream.color) if self.depth_enabled else None
+
     def _update_connection_state(self):
         """Update connection state based on current conditions."""
         current_time = time.time()
         
         # If we're connected but haven't received frames recently, mark as disconnected
-        if (self.connection_state == "connected" and 
-            current_time - self.last_successful_frame > self.connection_timeout):
+        if (self.status.state == "connected" and 
+            current_time - self.status.last_successful_frame > self.connection_timeout):
             logger.warning("Camera connection timeout - no frames received recently")
-            self.connection_state = "disconnected"
-            self.running = False
+            self.status.state = "disconnected"
+            self.status.running = False
 
     def start(self):
         """Start the RealSense pipeline with retry mechanism and device management."""
         
         # Check for conflicting processes first
-        conflicting_processes = self._find_conflicting_processes()
+        conflicting_processes = self._find_conflicting_processes(quick=not self.diagnose_conflicts)
         if conflicting_processes:
             logger.warning("Found potentially conflicting processes:")
             for proc in conflicting_processes:
@@ -293,23 +428,12 @@ class RealSenseBackend(CameraBackend):
                 if not self._check_device_availability():
                     raise CameraError("RealSense device is not available or in use")
                 
-                # Create new pipeline and config
-                self.pipeline = rs.pipeline()
-                config = rs.config()
-                
-                if self.serial:
-                    config.enable_device(self.serial)
-
-                config.enable_stream(rs.stream.color, self.width, self.height,
-                                     rs.format.bgr8, self.fps)
-
                 # Attempt to start the pipeline
-                self.pipeline.start(config)
-                self.align = rs.align(rs.stream.color)
-                self.running = True
-                self.connection_state = "connected"
-                self.last_successful_frame = time.time()
-                self.connection_retry_count = 0
+                self._start_pipeline()
+                self.status.running = True
+                self.status.state = "connected"
+                self.status.last_successful_frame = time.time()
+                self.status.retry_count = 0
                 
                 logger.info("RealSense pipeline started successfully")
                 return  # Success, exit retry loop
@@ -336,8 +460,8 @@ class RealSenseBackend(CameraBackend):
                     time.sleep(self.retry_delay)
         
         # All retries failed - set state to failed
-        self.connection_state = "failed"
-        self.last_connection_attempt = time.time()
+        self.status.state = "failed"
+        self.status.last_attempt = time.time()
         
         error_msg = f"Failed to start RealSense after {self.max_retries} attempts"
         if conflicting_processes:
@@ -348,8 +472,8 @@ class RealSenseBackend(CameraBackend):
 
     def stop(self):
         """Stop the RealSense pipeline and ensure proper cleanup."""
-        self.running = False
-        self.connection_state = "disconnected"
+        self.status.running = False
+        self.status.state = "disconnected"
         
         if self.pipeline:
             try:
@@ -363,11 +487,12 @@ class RealSenseBackend(CameraBackend):
         
         # Additional cleanup
         self.align = None
+        self._queue = None
         
         # Reset connection tracking
-        self.connection_retry_count = 0
-        self.last_connection_attempt = 0.0
-        self.last_successful_frame = 0.0
+        self.status.retry_count = 0
+        self.status.last_attempt = 0.0
+        self.status.last_successful_frame = 0.0
         
         # Wait a moment to ensure the device is fully released
         time.sleep(0.5)
@@ -381,7 +506,7 @@ class RealSenseBackend(CameraBackend):
         self._update_connection_state()
         
         # If we're not connected, try to reconnect
-        if self.connection_state != "connected":
+        if self.status.state != "connected":
             if self._attempt_reconnection():
                 # Reconnection successful, continue to get frame
                 pass
@@ -390,20 +515,28 @@ class RealSenseBackend(CameraBackend):
                 return None, current_time
         
         # If we don't have a valid pipeline, return None
-        if not self.running or not self.pipeline:
+        if not self.status.running or not self.pipeline or self._queue is None:
             return None, current_time
 
         try:
             # Use shorter timeout to avoid blocking for too long
-            frames = self.pipeline.wait_for_frames(timeout_ms=1000)
-            frames = self.align.process(frames)
-            color_frame = frames.get_color_frame()
+            frame = self._queue.wait_for_frame(1000)
+            if frame.is_frameset():
+                frames = frame.as_frameset()
+                if self.align is not None:
+                    frames = self.align.process(frames)
+                color_frame = frames.get_color_frame()
+            else:
+                frames = frame
+                color_frame = frame.as_video_frame()
 
             if not color_frame:
                 logger.debug("No color frame received")
                 return None, current_time
                 
-            color_image = np.asanyarray(color_frame.get_data())
+            # Zero-copy view over the frame buffer; the view keeps the frame alive
+            color_image = np.frombuffer(color_frame.get_data(), dtype=np.uint8).reshape(
+                self.height, self.width, 3)
             ts = frames.get_timestamp() / 1000.0  # ms → s
             
             # Apply rotation if needed
@@ -411,26 +544,30 @@ class RealSenseBackend(CameraBackend):
                 color_image = self._rotate_image(color_image)
             
             # Update successful frame timestamp
-            self.last_successful_frame = current_time
+            self.status.last_successful_frame = current_time
             
             return color_image, ts
             
         except Exception as e:
+            # Classify by type first; fall back to a single lowercased message
+            not_started = isinstance(e, rs.wrong_api_call_sequence_error)
+            message = "" if not_started else str(e).lower()
+
             # Check if this is a "pipeline not started" error
-            if "cannot be called before start" in str(e).lower():
+            if not_started or "cannot be called before start" in message:
                 logger.warning("Pipeline not properly started, marking as disconnected")
-                self.connection_state = "disconnected"
-                self.running = False
+                self.status.state = "disconnected"
+                self.status.running = False
                 return None, current_time
             
             # Only log as error if it's not a timeout (which is normal)
-            if "timeout" in str(e).lower() or "didn't arrive" in str(e).lower():
+            if _is_timeout_message(message):
                 logger.debug(f"RealSense frame timeout (normal): {e}")
             else:
                 logger.warning(f"RealSense frame grab failed: {e}")
                 # Mark as disconnected if we get persistent errors
-                self.connection_state = "disconnected"
-                self.running = False
+                self.status.state = "disconnected"
+                self.status.running = False
                 
             return None, current_time
 
@@ -440,18 +577,20 @@ class CameraService:
     def __init__(self, backend: CameraBackend, restart_interval: int = 3600):
         self.backend = backend
         self.restart_interval = restart_interval
-        self.last_restart = 0.0
+        self.last_restart = 0  # time.monotonic_ns() of the last (re)start
         self.running = False
-        self.lock = threading.Lock()
         self.worker: Optional[threading.Thread] = None
-        self.frame: Tuple[Optional[np.ndarray], float] = (None, 0.0)
+        # Single writer (_loop) publishes a new (frame, ts, version) tuple per
+        # frame; rebinding an attribute is atomic under the GIL, so readers need
+        # no lock. version grows only when a real frame arrives.
+        self.frame: Tuple[Optional[np.ndarray], float, int] = (None, 0.0, 0)
 
     def start(self):
         """Start the camera service with better error handling."""
         try:
             # Always start the worker thread, even if backend fails
             self.running = True
-            self.last_restart = time.time()
+            self.last_restart = time.monotonic_ns()
             self.worker = threading.Thread(target=self._loop, daemon=True)
             self.worker.start()
             
@@ -462,9 +601,8 @@ class CameraService:
             except Exception as backend_error:
                 logger.warning(f"CameraService started without camera: {backend_error}")
                 # Set backend to disconnected state so it will try to reconnect
-                if hasattr(self.backend, 'connection_state'):
-                    self.backend.connection_state = "disconnected"
-                    self.backend.running = False
+                self.backend.connection_state = "disconnected"
+                self.backend.running = False
                 logger.info("CameraService will attempt to reconnect when camera becomes available")
                 
         except Exception as e:
@@ -488,34 +626,43 @@ class CameraService:
         max_consecutive_errors = 10
         consecutive_timeouts = 0
         max_consecutive_timeouts = 50  # Allow more timeouts before considering it an error
-        last_connection_log = 0.0
-        connection_log_interval = 30.0  # Log connection status every 30 seconds
-        last_camera_check = 0.0
-        camera_check_interval = 10.0  # Check for camera availability every 10 seconds
+        # Loop bookkeeping uses integer monotonic nanoseconds: immune to wall-clock
+        # jumps and no float boxing. Backend timestamps stay wall-clock for the status API.
+        last_connection_log = 0
+        connection_log_interval_ns = 30 * NS_PER_SEC  # Log connection status every 30 seconds
+        last_camera_check = 0
+        camera_check_interval_ns = 10 * NS_PER_SEC  # Check for camera availability every 10 seconds
+        restart_interval_ns = int(self.restart_interval * NS_PER_SEC)
+        # Bound once: CameraBackend always carries a status, so no hasattr() per iteration
+        backend = self.backend
+        status = backend.status
+        version = self.frame[2]
         
         while self.running:
             try:
                 # Check if we need to attempt reconnection (for stub services)
-                current_time = time.time()
-                if (not self.backend.running and 
-                    hasattr(self.backend, 'connection_state') and 
-                    self.backend.connection_state == "disconnected" and
-                    current_time - last_camera_check > camera_check_interval):
+                now = time.monotonic_ns()
+                if (not status.running and 
+                    status.state == "disconnected" and
+                    now - last_camera_check > camera_check_interval_ns):
                     
                     logger.info("Checking for camera availability...")
-                    last_camera_check = current_time
+                    last_camera_check = now
                     
-                    if self.backend._check_device_availability():
+                    if backend._check_device_availability():
                         logger.info("Camera detected, attempting to start service")
                         try:
-                            self.backend.start()
+                            backend.start()
                             logger.info("Camera service started successfully")
                         except Exception as e:
                             logger.warning(f"Failed to start camera service: {e}")
                 
-                color, ts = self.backend.get_frame()
-                with self.lock:
-                    self.frame = (color, ts)
+                # pyrealsense2 releases the GIL while blocked in frame_queue.wait_for_frame() and
+                # NumPy copies run without it, so this thread doesn't starve the event loop
+                color, ts = backend.get_frame()
+                if color is not None:
+                    version += 1
+                self.frame = (color, ts, version)
                 
                 # Reset counters on successful frame
                 if color is not None:
@@ -526,20 +673,18 @@ class CameraService:
                     consecutive_timeouts += 1
 
                     # Log connection status periodically when no frames
-                    if (current_time - last_connection_log > connection_log_interval):
-                        if hasattr(self.backend, 'connection_state'):
-                            logger.info(f"Camera connection state: {self.backend.connection_state}")
-                        last_connection_log = current_time
+                    if (now - last_connection_log > connection_log_interval_ns):
+                        logger.info(f"Camera connection state: {status.state}")
+                        last_connection_log = now
 
                 # Periodic restart (only if we have a working connection)
-                if (time.time() - self.last_restart > self.restart_interval and 
-                    hasattr(self.backend, 'connection_state') and 
-                    self.backend.connection_state == "connected"):
+                if (now - self.last_restart > restart_interval_ns and 
+                    status.state == "connected"):
                     logger.info("Restart interval reached, restarting backend")
-                    self.backend.stop()
+                    backend.stop()
                     time.sleep(1)
-                    self.backend.start()
-                    self.last_restart = time.time()
+                    backend.start()
+                    self.last_restart = time.monotonic_ns()
                     consecutive_errors = 0
                     consecutive_timeouts = 0
                     
@@ -547,7 +692,7 @@ class CameraService:
                 consecutive_errors += 1
                 
                 # Only log as error if it's not a timeout
-                if "timeout" in str(e).lower() or "didn't arrive" in str(e).lower():
+                if _is_timeout_message(str(e).lower()):
                     if consecutive_timeouts >= max_consecutive_timeouts:
                         logger.warning(f"Too many consecutive timeouts ({consecutive_timeouts}), checking camera health")
                         consecutive_timeouts = 0
@@ -558,9 +703,9 @@ class CameraService:
                 if consecutive_errors >= max_consecutive_errors:
                     logger.warning("Too many consecutive errors, attempting backend restart")
                     try:
-                        self.backend.stop()
+                        backend.stop()
                         time.sleep(2)
-                        self.backend.start()
+                        backend.start()
                         consecutive_errors = 0
                         consecutive_timeouts = 0
                         logger.info("Backend restarted successfully")
@@ -570,20 +715,16 @@ class CameraService:
                 time.sleep(0.1)  # Shorter sleep for more responsive handling
 
     def get_latest(self) -> Tuple[Optional[np.ndarray], float]:
-        with self.lock:
-            return self.frame
+        color, ts, _ = self.frame
+        return color, ts
+
+    def get_latest_versioned(self) -> Tuple[Optional[np.ndarray], float, int]:
+        """Like get_latest(), plus a counter that changes only when a new frame arrives."""
+        return self.frame
     
     def get_connection_status(self) -> dict:
         """Get detailed connection status information."""
-        if hasattr(self.backend, 'connection_state'):
-            return {
-                "state": self.backend.connection_state,
-                "retry_count": getattr(self.backend, 'connection_retry_count', 0),
-                "last_attempt": getattr(self.backend, 'last_connection_attempt', 0),
-                "last_successful_frame": getattr(self.backend, 'last_successful_frame', 0),
-                "running": self.backend.running
-            }
-        return {"state": "unknown", "running": False}
+        return asdict(self.backend.status)
 
 
 if __name__ == "__main__":
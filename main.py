@@ -1,10 +1,12 @@
 import os
 import sys
+import hashlib
 import logging
+from typing import Optional
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 if CURRENT_DIR not in sys.path:
@@ -15,10 +17,36 @@ from routes import api
 
 logger = logging.getLogger("main")
 
+INDEX_PATH = os.path.join(CURRENT_DIR, "index.html")
+
+# index.html читается один раз при старте и отдаётся из памяти
+_index_bytes: Optional[bytes] = None
+_index_etag: Optional[str] = None
+
+
+def _load_index():
+    global _index_bytes, _index_etag
+    try:
+        with open(INDEX_PATH, "rb") as f:
+            _index_bytes = f.read()
+    except OSError as e:
+        logger.warning("index.html not loaded: %s", e)
+        _index_bytes = None
+        _index_etag = None
+        return
+    _index_etag = '"%s"' % hashlib.md5(_index_bytes).hexdigest()
+
+
+def _index_response():
+    if _index_bytes is None:
+        return JSONResponse(content={"error": "index.html not found"}, status_code=404)
+    return Response(_index_bytes, media_type="text/html", headers={"ETag": _index_etag})
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Инициализация и корректное завершение приложения."""
+    _load_index()
     await init_state()
     try:
         yield
@@ -29,7 +57,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title="Camera WebRTC Microservice",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # --- Routers ---
@@ -40,34 +69,31 @@ app.include_router(api.router, tags=["Color Camera WebRTC"])
 app.include_router(api.router, prefix="/api/v1/color_camera", tags=["Color Camera WebRTC Proxy"])
 
 # --- Static files ---
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Один экземпляр StaticFiles обслуживает оба пути
+static_files = StaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
 
 # Прокси-роут для статических файлов
-app.mount("/api/v1/color_camera/static", StaticFiles(directory="static"), name="static_proxy")
+app.mount("/api/v1/color_camera/static", static_files, name="static_proxy")
 
 
 @app.get("/", include_in_schema=False)
 async def root():
     """Отдаём index.html или JSON с ошибкой."""
-    filename = os.path.join(CURRENT_DIR, "index.html")
-    if not os.path.exists(filename):
-        return JSONResponse(content={"error": "index.html not found"}, status_code=404)
-    return FileResponse(filename)
+    return _index_response()
 
 @app.get("/api/v1/color_camera/", include_in_schema=False)
 async def proxy_root():
     """Прокси-роут для главной страницы через /api/v1/color_camera/."""
-    filename = os.path.join(CURRENT_DIR, "index.html")
-    if not os.path.exists(filename):
-        return JSONResponse(content={"error": "index.html not found"}, status_code=404)
-    return FileResponse(filename)
+    return _index_response()
 
 
 # --- Run with uvicorn ---
 if __name__ == "__main__":
     import uvicorn
 
-    host = os.getenv("SERVICE_HOST", "0.0.0.0")
-    port = int(os.getenv("SERVICE_PORT", "8104"))
+    env = os.environ
+    host = env.get("SERVICE_HOST", "0.0.0.0")
+    port = int(env.get("SERVICE_PORT", "8104"))
 
     uvicorn.run("main:app", host=host, port=port, reload=False)
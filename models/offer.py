@@ -10,11 +10,19 @@ class Offer(BaseModel):
     client_id: Optional[str] = None
 
 
-class IceCandidate(BaseModel):
+class IceCandidateEntry(BaseModel):
     candidate: str
     sdp_mid: Optional[str] = None
     sdp_mline_index: Optional[int] = None
+
+
+class IceCandidate(IceCandidateEntry):
+    client_id: str
+
+
+class IceCandidateBatch(BaseModel):
     client_id: str
+    candidates: List[IceCandidateEntry]
 
 
 class IceConfig(BaseModel):
@@ -1,76 +1,134 @@
 from drivers.camera import CameraService
 from service.video_service import CameraStreamTrack
 from models.offer import Offer
-from app.state import get_ice_config_state, update_connection_state, remove_connection
-from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer, RTCIceCandidate
+from app.state import get_cached_ice_servers, record_connection_state, remove_connection
+from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceCandidate
+from aiortc.sdp import candidate_from_sdp
+import asyncio
 import json
-from models.offer import Offer, IceConfig, IceCandidate
+import orjson
+from typing import Dict, List, Optional
+from models.offer import Offer, IceConfig, IceCandidateEntry
 import logging
 logger = logging.getLogger("webrtc")
 
+# Keepalive fast path: canonical ping encodings are matched without parsing JSON.
+# The pong stays a str so it goes out as a text message like the client's ping.
+_PINGS = frozenset(('{"type":"ping"}', '{"type": "ping"}', b'{"type":"ping"}', b'{"type": "ping"}'))
+_PONG = json.dumps({"type": "pong"})
+
+_CANDIDATE_PREFIXES = ("a=", "candidate:")
+
+def parse_ice_candidate(candidate: str, sdp_mid: Optional[str], sdp_mline_index: Optional[int]) -> Optional[RTCIceCandidate]:
+    """Parse a browser ICE candidate string into an aiortc RTCIceCandidate.
+
+    Accepts "candidate:..." (as sent by RTCIceCandidate.candidate), "a=candidate:..."
+    and the bare attribute value. Returns None for the empty end-of-candidates
+    marker and raises ValueError for anything that cannot be parsed.
+    """
+    if not candidate:
+        return None
+    sdp = candidate
+    for prefix in _CANDIDATE_PREFIXES:
+        if sdp.startswith(prefix):
+            sdp = sdp[len(prefix):]
+    try:
+        ice_candidate = candidate_from_sdp(sdp)
+    except (ValueError, IndexError, AssertionError) as e:  # aiortc asserts on short candidates
+        raise ValueError(f"Invalid ICE candidate {candidate!r}") from e
+    ice_candidate.sdpMid = sdp_mid
+    ice_candidate.sdpMLineIndex = sdp_mline_index
+    return ice_candidate
+
 class WebRTCSession:
     def __init__(self, client_id: str, service: CameraService, mode: str = "color"):
         self.client_id = client_id
         self.service = service
         self.pc = None
         self.track = CameraStreamTrack(service, mode=mode)
+        # Candidates that arrive before the remote description is applied are
+        # buffered and flushed right after setRemoteDescription().
+        self._remote_desc_set = asyncio.Event()
+        self._pending_candidates: List[RTCIceCandidate] = []
+        # Last state recorded per kind; aiortc repeats events during negotiation
+        self._last_state: Dict[str, str] = {}
 
     async def create(self, offer: Offer):
         # ICE configuration
-        current_ice = await get_ice_config_state()
-        ice_servers = []
-        urls = current_ice.get("urls") or []
-        if urls:
-            ice_servers.append(RTCIceServer(
-                urls=urls,
-                username=current_ice.get("username"),
-                credential=current_ice.get("credential")
-            ))
+        ice_servers = await get_cached_ice_servers()
 
         self.pc = RTCPeerConnection(RTCConfiguration(iceServers=ice_servers))
         self.pc.addTrack(self.track)
 
         @self.pc.on("connectionstatechange")
-        async def on_connectionstatechange():
+        def on_connectionstatechange():
             state = self.pc.connectionState
+            if self._last_state.get("connection") == state:
+                return
+            self._last_state["connection"] = state
             logger.info(f"Connection {self.client_id} state={state}")
-            await update_connection_state(self.client_id, "connection", state)
+            record_connection_state(self.client_id, "connection", state)
             if state in ("failed", "closed", "disconnected"):
                 # Don't call self.close() here as it might cause double cleanup
                 # The state manager will handle cleanup automatically
                 pass
 
         @self.pc.on("iceconnectionstatechange")
-        async def on_iceconnectionstatechange():
+        def on_iceconnectionstatechange():
             state = self.pc.iceConnectionState
+            if self._last_state.get("ice_connection") == state:
+                return
+            self._last_state["ice_connection"] = state
             logger.info(f"ICE {self.client_id} state={state}")
-            await update_connection_state(self.client_id, "ice_connection", state)
+            record_connection_state(self.client_id, "ice_connection", state)
 
         @self.pc.on("datachannel")
         def on_datachannel(channel):
             @channel.on("message")
             def on_message(message):
+                if message in _PINGS:
+                    channel.send(_PONG)
+                    return
                 try:
-                    data = json.loads(message)
+                    data = orjson.loads(message)
                     if data.get("type") == "ping":
-                        channel.send(json.dumps({"type": "pong"}))
+                        channel.send(_PONG)
                 except Exception as e:
                     logger.error(f"Datachannel error: {e}")
 
         # WebRTC SDP handshake
         await self.pc.setRemoteDescription(RTCSessionDescription(sdp=offer.sdp, type=offer.type))
+        self._remote_desc_set.set()
+        pending, self._pending_candidates = self._pending_candidates, []
+        for candidate in pending:
+            # A bad buffered candidate must not fail the whole offer
+            try:
+                await self.pc.addIceCandidate(candidate)
+            except Exception as e:
+                logger.warning(f"Dropping buffered ICE candidate for {self.client_id}: {e}")
         answer = await self.pc.createAnswer()
         await self.pc.setLocalDescription(answer)
         return self.pc.localDescription
 
-    async def add_ice_candidate(self, candidate: IceCandidate):
+    async def add_ice_candidate(self, candidate: IceCandidateEntry):
+        """Adds (or buffers) a candidate; raises ValueError if it cannot be parsed."""
+        await self.add_parsed_ice_candidate(
+            parse_ice_candidate(candidate.candidate, candidate.sdp_mid, candidate.sdp_mline_index)
+        )
+
+    async def add_raw_ice_candidate(self, candidate: str, sdp_mid: Optional[str], sdp_mline_index: Optional[int]):
+        """Same as add_ice_candidate, for fields taken straight from the request JSON."""
+        await self.add_parsed_ice_candidate(parse_ice_candidate(candidate, sdp_mid, sdp_mline_index))
+
+    async def add_parsed_ice_candidate(self, ice_candidate: Optional[RTCIceCandidate]):
+        if ice_candidate is None:
+            # End-of-candidates marker
+            return
+        if not self._remote_desc_set.is_set():
+            self._pending_candidates.append(ice_candidate)
+            return
         if not self.pc:
             raise RuntimeError("PeerConnection not initialized")
-        ice_candidate = RTCIceCandidate(
-            candidate=candidate.candidate,
-            sdpMid=candidate.sdp_mid,
-            sdpMLineIndex=candidate.sdp_mline_index
-        )
         await self.pc.addIceCandidate(ice_candidate)
 
     async def close(self):
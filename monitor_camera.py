@@ -8,11 +8,18 @@ import requests
 import time
 import json
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+
+# Keep-alive session reused across polls
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
 
 def get_camera_status(base_url="http://localhost:8104"):
     """Get camera status from the service."""
     try:
-        response = requests.get(f"{base_url}/camera/status", timeout=5)
+        response = _SESSION.get(f"{base_url}/camera/status", timeout=5)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -1,23 +1,34 @@
 # app/api/webrtc.py
+import asyncio
 import json
+import orjson
+import time
 import uuid
 import logging
-import time
-from fastapi import APIRouter, HTTPException
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, Request, Response
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer, RTCIceCandidate
 
 from service.video_service import CameraStreamTrack
-from models.webrtc import WebRTCSession
-from models.offer import Offer, IceConfig, IceCandidate
+from models.webrtc import WebRTCSession, parse_ice_candidate
+from models.offer import Offer, IceConfig, IceCandidate, IceCandidateBatch
 from app.state import (get_ice_config_state, update_ice_config_state,
     create_connection, get_connection, remove_connection,
-    update_connection_state, get_all_connections, cleanup_old_connections,
+    update_connection_state, get_client_ids_snapshot, cleanup_old_connections,
     force_release_camera, get_current_client_info, get_camera_service
 )
 
 logger = logging.getLogger("webrtc")
 router = APIRouter()
 
+# Sessions whose offer is still being processed, so early ICE candidates can be buffered
+_pending_sessions: Dict[str, WebRTCSession] = {}
+
+# /camera/status body is reused for a short window so pollers don't hit the camera service each time
+STATUS_CACHE_TTL = 0.5
+_status_cache: Dict[str, Any] = {"t": 0.0, "body": None}
+_status_lock = asyncio.Lock()
+
 @router.get("/ice_config")
 async def get_ice_config():
     """Returns current ICE configuration."""
@@ -28,7 +39,7 @@ async def get_ice_config():
 @router.post("/ice_config")
 async def update_ice_config(config: IceConfig):
     """Updates ICE configuration."""
-    updated_config = await update_ice_config_state(config.dict())
+    updated_config = await update_ice_config_state(config.model_dump())
     logger.info("ICE config updated")
     return updated_config
 
@@ -55,11 +66,18 @@ async def handle_offer(params: Offer, mode: str = "color"):
         session = WebRTCSession(client_id, camera_service, mode)
         
         logger.info(f"Creating offer for client {client_id}")
-        desc = await session.create(params)
+        # Stays registered until create_connection() returns, so /ice keeps
+        # finding this session while the previous client is being closed
+        _pending_sessions[client_id] = session
+        try:
+            desc = await session.create(params)
 
-        # State manager will automatically disconnect previous client
-        logger.info(f"Creating connection for client {client_id}")
-        await create_connection(client_id, session.pc, session.track, {"session": session})
+            # State manager will automatically disconnect previous client
+            logger.info(f"Creating connection for client {client_id}")
+            await create_connection(client_id, session.pc, session.track, {"session": session})
+        finally:
+            if _pending_sessions.get(client_id) is session:
+                del _pending_sessions[client_id]
         
         logger.info(f"Client {client_id} connected successfully, camera allocated")
         return {"sdp": desc.sdp, "type": desc.type, "client_id": client_id}
@@ -68,18 +86,75 @@ async def handle_offer(params: Offer, mode: str = "color"):
         logger.error(f"Error handling offer: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def _resolve_session(client_id: str) -> WebRTCSession:
+    """Finds the session for ICE candidates: in-flight offer or active connection.
+
+    The in-flight session wins so that a re-offer with the same client_id gets
+    its candidates instead of the peer connection it is about to replace.
+    """
+    session = _pending_sessions.get(client_id)
+    if session is not None:
+        return session
+    conn = await get_connection(client_id)
+    if conn is None:
+        raise HTTPException(status_code=404, detail="Client not found or already disconnected")
+    return conn.extra["session"]
+
 @router.post("/ice")
 async def add_ice(candidate: IceCandidate):
     """Adds ICE candidate - only for currently active client."""
-    conn = await get_connection(candidate.client_id)
-    if not conn:
-        raise HTTPException(status_code=404, detail="Client not found or already disconnected")
-    
-    session: WebRTCSession = conn["session"]
-    await session.add_ice_candidate(candidate)
+    session = await _resolve_session(candidate.client_id)
+    try:
+        await session.add_ice_candidate(candidate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     logger.debug(f"ICE candidate added for client {candidate.client_id}")
     return {"status": "ok"}
 
+@router.post("/ice/fast")
+async def add_ice_fast(request: Request):
+    """Adds ICE candidate from the raw body, skipping Pydantic validation.
+
+    Expects the same JSON shape as /ice.
+    """
+    try:
+        data = orjson.loads(await request.body())
+        client_id = data["client_id"]
+        candidate = data["candidate"]
+        sdp_mid = data.get("sdp_mid")
+        sdp_mline_index = data.get("sdp_mline_index")
+        # No model here, so check the types /ice would have validated
+        if (not isinstance(client_id, str) or not isinstance(candidate, str)
+                or not (sdp_mid is None or isinstance(sdp_mid, str))
+                or not (sdp_mline_index is None
+                        or (isinstance(sdp_mline_index, int) and not isinstance(sdp_mline_index, bool)))):
+            raise TypeError
+        ice_candidate = parse_ice_candidate(candidate, sdp_mid, sdp_mline_index)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Malformed ICE candidate payload")
+    session = await _resolve_session(client_id)
+    await session.add_parsed_ice_candidate(ice_candidate)
+    logger.debug(f"ICE candidate added for client {client_id}")
+    return {"status": "ok"}
+
+@router.post("/ice/batch")
+async def add_ice_batch(batch: IceCandidateBatch):
+    """Adds several ICE candidates in one request.
+
+    Clients should debounce `icecandidate` events (~20 ms) and flush them
+    here instead of POSTing each candidate to /ice.
+    """
+    session = await _resolve_session(batch.client_id)
+    # Parse everything first so a bad entry rejects the batch without adding part of it
+    try:
+        parsed = [parse_ice_candidate(c.candidate, c.sdp_mid, c.sdp_mline_index) for c in batch.candidates]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for ice_candidate in parsed:
+        await session.add_parsed_ice_candidate(ice_candidate)
+    logger.debug(f"{len(batch.candidates)} ICE candidates added for client {batch.client_id}")
+    return {"status": "ok", "added": len(batch.candidates)}
+
 @router.delete("/connections/{client_id}")
 async def close_connection(client_id: str):
     """Closes connection for the specified client."""
@@ -87,7 +162,7 @@ async def close_connection(client_id: str):
     if not conn:
         raise HTTPException(status_code=404, detail="Client not found or already disconnected")
     
-    session: WebRTCSession = conn["session"]
+    session: WebRTCSession = conn.extra["session"]
     await session.close()
     await remove_connection(client_id)  # Notify state manager
     
@@ -97,11 +172,11 @@ async def close_connection(client_id: str):
 @router.get("/connections")
 async def list_connections():
     """Returns information about current connections."""
-    connections = await get_all_connections()
+    clients = await get_client_ids_snapshot()
     current_info = await get_current_client_info()
     
     response = {
-        "clients": list(connections.keys()),
+        "clients": list(clients),
         "current_client": current_info["client_id"] if current_info else None,
         "connection_duration": current_info["time_in_cell"] if current_info else 0
     }
@@ -133,7 +208,25 @@ async def force_release():
 
 @router.get("/camera/status")
 async def get_camera_status():
-    """Returns detailed camera connection status."""
+    """Returns detailed camera connection status (cached for STATUS_CACHE_TTL seconds)."""
+    body = _status_cache["body"]
+    if body is not None and time.monotonic() - _status_cache["t"] < STATUS_CACHE_TTL:
+        return Response(content=body, media_type="application/json")
+    async with _status_lock:
+        # Another request may have refreshed the cache while we waited
+        body = _status_cache["body"]
+        if body is not None and time.monotonic() - _status_cache["t"] < STATUS_CACHE_TTL:
+            return Response(content=body, media_type="application/json")
+        status = await _build_camera_status()
+        if status["status"] != "ok":
+            return status
+        # Cache the encoded bytes so hits skip serialization as well
+        body = orjson.dumps(status)
+        _status_cache["body"] = body
+        _status_cache["t"] = time.monotonic()
+        return Response(content=body, media_type="application/json")
+
+async def _build_camera_status() -> Dict[str, Any]:
     try:
         camera_service = await get_camera_service()
         if camera_service is None:
@@ -179,9 +272,10 @@ async def force_camera_reconnect():
         
         # Force reconnection by stopping and starting the backend
         logger.info("Force camera reconnection requested")
-        camera_service.backend.stop()
-        time.sleep(1)
-        camera_service.backend.start()
+        # stop()/start() block on device I/O, keep them off the event loop
+        await asyncio.to_thread(camera_service.backend.stop)
+        await asyncio.sleep(1)
+        await asyncio.to_thread(camera_service.backend.start)
         
         return {
             "status": "ok",
@@ -11,6 +11,9 @@ from drivers.camera import CameraService, RealSenseBackend
 
 logger = logging.getLogger("video_service")
 
+# Сколько секунд повторять последний удачный кадр, прежде чем перейти на чёрный
+LAST_GOOD_FRAME_TTL = 2.0
+
 
 class CameraStreamTrack(VideoStreamTrack):
     """
@@ -23,35 +26,74 @@ class CameraStreamTrack(VideoStreamTrack):
         super().__init__()
         self.service = service
         self.mode = mode
+        # Чёрный кадр создаётся один раз и переиспользуется, пока камера недоступна
+        self._blank = np.zeros((480, 640, 3), dtype=np.uint8)
+        self._blank.flags.writeable = False
+        self._blank_frame = VideoFrame.from_ndarray(self._blank, format="bgr24")
+        # Переиспользуемый AVFrame для кадров камеры и numpy-view на его плоскость
+        self._vframe: Optional[VideoFrame] = None
+        self._vframe_view: Optional[np.ndarray] = None
+        # Момент (monotonic), когда в _vframe был записан последний удачный кадр
+        self._last_good_ts: float = 0.0
+        # Версия кадра CameraService, уже скопированного в _vframe
+        self._last_version: int = -1
         logger.info(f"CameraStreamTrack initialized in mode={mode}")
 
     async def recv(self) -> VideoFrame:
         pts, time_base = await self.next_timestamp()
         try:
-            color, ts = self.service.get_latest()
+            color, ts, version = self.service.get_latest_versioned()
 
             bgr: Optional[np.ndarray] = None
 
             if self.mode == "color" and color is not None:
                 bgr = color
                 
-            if bgr is None:
+            if bgr is not None:
+                if version != self._last_version or self._vframe is None:
+                    frame = self._fill_frame(bgr)
+                    self._last_version = version
+                else:
+                    # Камера ещё не выдала новый кадр: _vframe уже содержит этот, копия не нужна
+                    frame = self._vframe
+                self._last_good_ts = time.monotonic()
+            elif self._vframe is not None and time.monotonic() - self._last_good_ts < LAST_GOOD_FRAME_TTL:
+                # Короткий сбой: повторяем последний кадр (он ещё лежит в _vframe),
+                # кодеку это почти ничего не стоит в отличие от смены сцены на чёрный
+                frame = self._vframe
+            else:
                 # fallback: пустой кадр
-                bgr = np.zeros((480, 640, 3), dtype=np.uint8)
-
-            frame = VideoFrame.from_ndarray(bgr, format="bgr24")
+                frame = self._blank_frame
             frame.pts = pts
             frame.time_base = time_base
             return frame
 
         except Exception as e:
             logger.error(f"CameraStreamTrack recv() error: {e}")
-            bgr = np.zeros((480, 640, 3), dtype=np.uint8)
-            frame = VideoFrame.from_ndarray(bgr, format="bgr24")
+            frame = self._blank_frame
             frame.pts = pts
             frame.time_base = time_base
             return frame
 
+    def _fill_frame(self, bgr: np.ndarray) -> VideoFrame:
+        """Copy ``bgr`` straight into a reused AVFrame.
+
+        VideoFrame.from_ndarray() allocates a new AVFrame and copies the array
+        twice (tobytes + plane memcpy); here it is a single copy into a frame that
+        is allocated once per resolution. The sender encodes a frame before it
+        requests the next one, so reusing the AVFrame is safe.
+        """
+        height, width = bgr.shape[:2]
+        if self._vframe is None or self._vframe.width != width or self._vframe.height != height:
+            frame = VideoFrame(width=width, height=height, format="bgr24")
+            plane = frame.planes[0]
+            rows = np.frombuffer(plane, dtype=np.uint8).reshape(height, plane.line_size)
+            self._vframe = frame
+            self._vframe_view = rows[:, :width * 3].reshape(height, width, 3)
+        np.copyto(self._vframe_view, bgr)
+        return self._vframe
+
+
 def main():
     # Можно выбрать backend
     backend = RealSenseBackend(width=640, height=480, fps=30)